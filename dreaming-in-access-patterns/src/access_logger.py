@@ -23,19 +23,35 @@ import re
 from pathlib import Path
 from typing import Optional
 
+import fastjson
+
 DB_PATH = Path(__file__).parent / "access.db"
 
+# Text-format transcript patterns, compiled once
+# Pattern 1: tool call blocks
+_SEARCH_PATTERN = re.compile(
+    r'memory_search.*?["\']query["\']\s*[:=]\s*["\']([^"\']+)["\']',
+    re.DOTALL | re.IGNORECASE
+)
+_RESULT_PATTERN = re.compile(
+    r'(?:snippets|results|matches).*?(\[[\s\S]*?\])',
+    re.DOTALL
+)
+_QUERY_PATTERN = re.compile(r'query["\s:=]+["\']([^"\']+)')
 
-def get_db() -> sqlite3.Connection:
-    db = sqlite3.connect(str(DB_PATH))
-    db.execute("PRAGMA journal_mode=WAL")
+
+# DB paths whose schema has been created this process — DDL runs once, not per get_db()
+_schema_ready: set[str] = set()
+
+
+def _init_schema(db: sqlite3.Connection):
     db.execute("""
         CREATE TABLE IF NOT EXISTS access_events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             timestamp REAL NOT NULL,
             session_id TEXT,
             query TEXT NOT NULL,
-            results TEXT NOT NULL,  -- JSON: [{file, content, lines, score}]
+            results TEXT NOT NULL,  -- JSON: [[file, lines, score]] (older rows: [{file, content, lines, score}])
             n_results INTEGER NOT NULL,
             top_score REAL
         )
@@ -50,53 +66,220 @@ def get_db() -> sqlite3.Connection:
         )
     """)
     db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_access_timestamp ON access_events(timestamp)
+        CREATE INDEX IF NOT EXISTS idx_chunk_accesses ON chunk_energy(total_accesses DESC)
     """)
+    # Covering index for mirror's windowed reads (event stream, gaps, stats):
+    # everything but the results JSON, so those queries never touch the table.
+    # Supersedes idx_access_timestamp (a strict prefix of it).
     db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_chunk_accesses ON chunk_energy(total_accesses DESC)
+        CREATE INDEX IF NOT EXISTS idx_events_covering
+        ON access_events(timestamp, session_id, query, n_results, top_score)
     """)
+    db.execute("DROP INDEX IF EXISTS idx_access_timestamp")
+    # One row per retrieved chunk, written alongside the event, so readers never
+    # re-parse access_events.results
+    had_results_table = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'access_results'"
+    ).fetchone()
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS access_results (
+            event_id INTEGER NOT NULL,
+            chunk_key TEXT NOT NULL,  -- file:line_start, same key as chunk_energy
+            file TEXT,
+            score REAL,
+            ts REAL NOT NULL,
+            session_id TEXT,
+            FOREIGN KEY (event_id) REFERENCES access_events(id)
+        )
+    """)
+    db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_results_ts ON access_results(ts, session_id, chunk_key)
+    """)
+    if not had_results_table:
+        _backfill_access_results(db)
     db.commit()
+
+
+def _backfill_access_results(db: sqlite3.Connection):
+    """One-shot migration: explode existing access_events.results JSON into access_results."""
+    cursor = db.execute("SELECT id, timestamp, session_id, results FROM access_events ORDER BY id")
+    while True:
+        events = cursor.fetchmany(1000)
+        if not events:
+            break
+        rows = []
+        for event_id, ts, session_id, results in events:
+            for r in fastjson.loads(results) if results else []:
+                res = tuple(r) if isinstance(r, list) else _normalize_result(r)
+                rows.append(_result_row(event_id, res, ts, session_id))
+        db.executemany(_INSERT_RESULT, rows)
+
+
+def get_db() -> sqlite3.Connection:
+    db = sqlite3.connect(str(DB_PATH))
+    db.execute("PRAGMA journal_mode=WAL")
+    # Analytics data, recomputable from transcripts: a crash may lose the last
+    # batch, never corrupt the file. NORMAL skips the per-commit fsync under WAL.
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA mmap_size=268435456")  # 256MB
+    db.execute("PRAGMA cache_size=-65536")  # 64MB page cache
+    db.execute("PRAGMA wal_autocheckpoint=1000")
+    if str(DB_PATH) not in _schema_ready:
+        _init_schema(db)
+        _schema_ready.add(str(DB_PATH))
     return db
 
 
-def log_event(query: str, results: list[dict], session_id: str = None, timestamp: float = None):
-    """Log a single memory_search access event."""
+def _normalize_result(r: dict) -> tuple:
+    """
+    Search-result dict → (file, lines, score), the shape the logger works in.
+
+    Callers that build results themselves should emit the tuple directly and
+    skip the dict probes. score stays None when the result carried none.
+    """
+    return (str(r.get("file", r.get("path", "?"))), str(r.get("lines", r.get("line", "?"))), r.get("score"))
+
+
+_INSERT_EVENT = (
+    "INSERT INTO access_events (timestamp, session_id, query, results, n_results, top_score) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+_INSERT_RESULT = (
+    "INSERT INTO access_results (event_id, chunk_key, file, score, ts, session_id) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+def _result_row(event_id: int, res: tuple, ts: float, session_id: str) -> tuple:
+    file, lines, score = res
+    return (event_id, file + ":" + lines, file, 0.5 if score is None else score, ts, session_id)
+
+# One statement per chunk: insert on first access, accumulate on every later one.
+# first_accessed is only written by the INSERT branch.
+_UPSERT_CHUNK = (
+    "INSERT INTO chunk_energy (chunk_key, total_accesses, total_score, last_accessed, first_accessed) "
+    "VALUES (?, 1, ?, ?, ?) "
+    "ON CONFLICT(chunk_key) DO UPDATE SET "
+    "total_accesses = total_accesses + 1, "
+    "total_score = total_score + excluded.total_score, "
+    "last_accessed = excluded.last_accessed"
+)
+
+# Bulk variant: rows are pre-aggregated per chunk, so add the deltas.
+_UPSERT_CHUNK_AGG = (
+    "INSERT INTO chunk_energy (chunk_key, total_accesses, total_score, last_accessed, first_accessed) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(chunk_key) DO UPDATE SET "
+    "total_accesses = total_accesses + excluded.total_accesses, "
+    "total_score = total_score + excluded.total_score, "
+    "last_accessed = max(coalesce(last_accessed, 0), excluded.last_accessed)"
+)
+
+
+def log_event(query: str, results: list[dict], session_id: str = None, timestamp: float = None,
+              db: Optional[sqlite3.Connection] = None, commit: bool = True):
+    """
+    Log a single memory_search access event.
+
+    Pass an open `db` (and commit=False) to fold several events into one
+    transaction; otherwise a connection is opened and closed per call.
+    """
     ts = timestamp or time.time()
-    db = get_db()
+    own_db = db is None
+    if own_db:
+        db = get_db()
 
-    top_score = max((r.get("score", 0) for r in results), default=0)
+    results = [_normalize_result(r) for r in results]
+    top_score = max((res[2] or 0 for res in results), default=0)
 
-    db.execute(
-        "INSERT INTO access_events (timestamp, session_id, query, results, n_results, top_score) "
-        "VALUES (?, ?, ?, ?, ?, ?)",
-        (ts, session_id, query, json.dumps(results), len(results), top_score)
-    )
+    event_id = db.execute(
+        _INSERT_EVENT, (ts, session_id, query, fastjson.dumps(results), len(results), top_score)
+    ).lastrowid
+    rows = [_result_row(event_id, res, ts, session_id) for res in results]
+    db.executemany(_INSERT_RESULT, rows)
 
     # Update chunk energy for each result
-    for r in results:
-        chunk_key = f"{r.get('file', r.get('path', '?'))}:{r.get('lines', r.get('line', '?'))}"
-        score = r.get("score", 0.5)
+    db.executemany(_UPSERT_CHUNK, [(row[1], row[3], ts, ts) for row in rows])
 
-        existing = db.execute(
-            "SELECT total_accesses FROM chunk_energy WHERE chunk_key = ?",
-            (chunk_key,)
-        ).fetchone()
+    if commit:
+        db.commit()
+    if own_db:
+        db.close()
 
-        if existing:
-            db.execute(
-                "UPDATE chunk_energy SET total_accesses = total_accesses + 1, "
-                "total_score = total_score + ?, last_accessed = ? WHERE chunk_key = ?",
-                (score, ts, chunk_key)
-            )
-        else:
-            db.execute(
-                "INSERT INTO chunk_energy (chunk_key, total_accesses, total_score, last_accessed, first_accessed) "
-                "VALUES (?, 1, ?, ?, ?)",
-                (chunk_key, score, ts, ts)
-            )
 
-    db.commit()
-    db.close()
+def log_events_bulk(events: list[tuple], session_id: str = None,
+                    db: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Log many access events in a single transaction.
+
+    events: [(query, results, timestamp)] — results as (file, lines, score) tuples
+    (see _normalize_result), timestamp may be None (now).
+    Backfills were paying one commit (and fsync) per event; this pays one total.
+    Pass an open `db` already inside a transaction to join it; the caller commits.
+    Returns number of events logged.
+    """
+    if not events:
+        return 0
+
+    now = time.time()
+    event_rows = []
+    result_rows = []  # (index into event_rows, result, ts) — ids assigned at insert time
+    # chunk_key → [accesses, score, last_ts, first_ts]; one UPSERT per unique chunk
+    agg = {}
+    for query, results, timestamp in events:
+        ts = timestamp or now
+        top_score = max((res[2] or 0 for res in results), default=0)
+        event_rows.append((ts, session_id, query, fastjson.dumps(results), len(results), top_score))
+        for res in results:
+            result_rows.append((len(event_rows) - 1, res, ts))
+            file, lines, score = res
+            key = file + ":" + lines
+            if score is None:
+                score = 0.5
+            a = agg.get(key)
+            if a is None:
+                agg[key] = [1, score, ts, ts]
+            else:
+                a[0] += 1
+                a[1] += score
+                if ts > a[2]:
+                    a[2] = ts
+                if ts < a[3]:
+                    a[3] = ts
+
+    own_db = db is None
+    if own_db:
+        db = get_db()
+    # Joining a caller's transaction: it already holds the write lock and commits
+    own_tx = not db.in_transaction
+    try:
+        if own_tx:
+            db.execute("BEGIN IMMEDIATE")
+        # AUTOINCREMENT ids are handed out as seq+1, seq+2, ... and the write lock
+        # is held, so the new events' ids are known without a per-row lastrowid.
+        seq = db.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'access_events'"
+        ).fetchone()
+        first_id = (seq[0] if seq else 0) + 1
+        db.executemany(_INSERT_EVENT, event_rows)
+        db.executemany(
+            _INSERT_RESULT,
+            [_result_row(first_id + i, res, ts, session_id) for i, res, ts in result_rows]
+        )
+        db.executemany(_UPSERT_CHUNK_AGG, [(k, *v) for k, v in agg.items()])
+        if own_tx:
+            db.commit()
+    except Exception:
+        if own_tx:
+            db.rollback()
+        raise
+    finally:
+        if own_db:
+            db.close()
+
+    return len(event_rows)
 
 
 def extract_from_transcript(transcript: str, session_id: str = None) -> int:
@@ -106,50 +289,39 @@ def extract_from_transcript(transcript: str, session_id: str = None) -> int:
     Handles both structured JSON transcripts and text-format transcripts.
     Returns number of access events logged.
     """
-    count = 0
-
     # Try JSON format first (array of messages)
     try:
-        messages = json.loads(transcript)
+        messages = fastjson.loads(transcript)
         if isinstance(messages, list):
             return _extract_from_messages(messages, session_id)
-    except (json.JSONDecodeError, TypeError):
+    except (fastjson.JSONDecodeError, TypeError):
         pass
 
     # Text format: look for memory_search patterns
-    # Pattern 1: tool call blocks
-    search_pattern = re.compile(
-        r'memory_search.*?["\']query["\']\s*[:=]\s*["\']([^"\']+)["\']',
-        re.DOTALL | re.IGNORECASE
-    )
-    result_pattern = re.compile(
-        r'(?:snippets|results|matches).*?(\[[\s\S]*?\])',
-        re.DOTALL
-    )
-
     # Find all memory_search queries in the text
-    queries = search_pattern.findall(transcript)
-    results_blocks = result_pattern.findall(transcript)
+    queries = _SEARCH_PATTERN.findall(transcript)
+    results_blocks = _RESULT_PATTERN.findall(transcript)
 
     # Pair them up best-effort
+    events = []
     for i, query in enumerate(queries):
         results = []
         if i < len(results_blocks):
             try:
-                results = json.loads(results_blocks[i])
-            except json.JSONDecodeError:
+                results = fastjson.loads(results_blocks[i])
+            except fastjson.JSONDecodeError:
                 pass
 
         if query:  # Log even without results — the query itself is signal
-            log_event(query, results if isinstance(results, list) else [], session_id)
-            count += 1
+            results = results if isinstance(results, list) else []
+            events.append((query, [_normalize_result(r) for r in results], None))
 
-    return count
+    return log_events_bulk(events, session_id)
 
 
 def _extract_from_messages(messages: list, session_id: str = None) -> int:
     """Extract from structured message format."""
-    count = 0
+    events = []
     pending_query = None
 
     for msg in messages:
@@ -166,27 +338,26 @@ def _extract_from_messages(messages: list, session_id: str = None) -> int:
                             result_content = block.get("content", "")
                             if isinstance(result_content, str):
                                 try:
-                                    parsed = json.loads(result_content)
+                                    parsed = fastjson.loads(result_content)
                                     if isinstance(parsed, dict) and "snippets" in parsed:
                                         results = parsed["snippets"]
                                     elif isinstance(parsed, list):
                                         results = parsed
                                     else:
                                         results = []
-                                except json.JSONDecodeError:
+                                except fastjson.JSONDecodeError:
                                     results = []
                             else:
                                 results = []
-                            log_event(pending_query, results, session_id)
+                            events.append((pending_query, [_normalize_result(r) for r in results], None))
                             pending_query = None
-                            count += 1
             elif isinstance(content, str) and "memory_search" in content:
                 # Text content mentioning memory_search
-                match = re.search(r'query["\s:=]+["\']([^"\']+)', content)
+                match = _QUERY_PATTERN.search(content)
                 if match:
                     pending_query = match.group(1)
 
-    return count
+    return log_events_bulk(events, session_id)
 
 
 def stats() -> dict:
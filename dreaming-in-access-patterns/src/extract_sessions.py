@@ -14,24 +14,26 @@ Usage:
 """
 
 import json
+import mmap
 import sqlite3
 import sys
 import os
 import time
 from pathlib import Path
 from datetime import datetime
+from typing import Iterator, Optional
 
 # Import the access logger
 sys.path.insert(0, str(Path(__file__).parent))
-from access_logger import log_event, get_db
+from access_logger import log_events_bulk, get_db
+import fastjson
 
 SESSIONS_DIR = Path(os.path.expanduser("~/.openclaw/agents/main/sessions"))
 STATE_DB = Path(__file__).parent / "access.db"
 
 
-def get_processed_sessions() -> set:
-    """Get set of session IDs already processed."""
-    db = get_db()
+def init_state(db: sqlite3.Connection):
+    """Create the extractor's bookkeeping table. Run once per process, at startup."""
     db.execute("""
         CREATE TABLE IF NOT EXISTS processed_sessions (
             session_id TEXT PRIMARY KEY,
@@ -40,31 +42,49 @@ def get_processed_sessions() -> set:
         )
     """)
     db.commit()
+
+
+def get_processed_sessions(db: sqlite3.Connection) -> set:
+    """Get set of session IDs already processed."""
     rows = db.execute("SELECT session_id FROM processed_sessions").fetchall()
-    db.close()
     return {r[0] for r in rows}
 
 
-def mark_processed(session_id: str, events: int):
-    """Mark a session as processed."""
-    db = get_db()
-    db.execute("""
-        CREATE TABLE IF NOT EXISTS processed_sessions (
-            session_id TEXT PRIMARY KEY,
-            processed_at REAL,
-            events_extracted INTEGER
-        )
-    """)
-    db.execute(
+def mark_processed(db: sqlite3.Connection, rows: list[tuple]):
+    """Mark sessions as processed. rows: [(session_id, processed_at, events)]."""
+    db.executemany(
         "INSERT OR REPLACE INTO processed_sessions (session_id, processed_at, events_extracted) "
         "VALUES (?, ?, ?)",
-        (session_id, time.time(), events)
+        rows
     )
-    db.commit()
-    db.close()
 
 
-def extract_session(session_path: Path) -> int:
+def _iter_jsonl(path: Path) -> Iterator[bytes]:
+    """
+    Yield the non-blank lines of a JSONL file as raw bytes.
+
+    mmap + a newline find() skips the text layer's per-line str decode; both JSON
+    backends parse bytes directly.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # mmap can't map an empty file
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            pos, end = 0, len(mm)
+            while pos < end:
+                nl = mm.find(b"\n", pos)
+                if nl == -1:
+                    nl = end
+                line = mm[pos:nl]
+                pos = nl + 1
+                if line and not line.isspace():
+                    yield line
+        finally:
+            mm.close()
+
+
+def extract_session(session_path: Path, db: Optional[sqlite3.Connection] = None) -> int:
     """
     Extract memory_search access events from a session JSONL file.
     
@@ -73,97 +93,76 @@ def extract_session(session_path: Path) -> int:
     - Tool results are in messages with parentId matching the call message's id
     - Results are JSON: {results: [{path, startLine, endLine, score, snippet}]}
     
+    Pass `db` to log into the caller's open transaction.
     Returns number of events extracted.
     """
-    lines = []
+    session_id = session_path.stem
+
+    # Single streamed pass; keep only what the pairing step needs, not every parsed line
+    calls = []             # (call message id, timestamp string, query)
+    result_by_parent = {}  # parent id → first toolResult message replying to it
     try:
-        with open(session_path) as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    lines.append(json.loads(line))
-    except (json.JSONDecodeError, IOError) as e:
-        return 0
+        for line in _iter_jsonl(session_path):
+            obj = fastjson.loads(line)
+            msg = obj.get("message", {})
 
-    session_id = session_path.stem
-    count = 0
-
-    # Build index: message id → message object
-    id_to_obj = {}
-    for obj in lines:
-        oid = obj.get("id", "")
-        if oid:
-            id_to_obj[oid] = obj
-
-    # Find memory_search calls
-    for obj in lines:
-        msg = obj.get("message", {})
-        content = msg.get("content", [])
-        if not isinstance(content, list):
-            continue
-
-        call_msg_id = obj.get("id", "")
-        timestamp_str = obj.get("timestamp", "")
-
-        for block in content:
-            if not isinstance(block, dict):
-                continue
-            if block.get("type") != "toolCall" or block.get("name") != "memory_search":
-                continue
+            parent_id = obj.get("parentId")
+            if parent_id is not None and msg.get("role") == "toolResult":
+                result_by_parent.setdefault(parent_id, msg)
 
-            query = block.get("arguments", {}).get("query", "")
-            if not query:
+            content = msg.get("content", [])
+            if not isinstance(content, list):
                 continue
-
-            # Parse timestamp
-            ts = None
-            if timestamp_str:
-                try:
-                    dt = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-                    ts = dt.timestamp()
-                except (ValueError, TypeError):
-                    pass
-            if ts is None:
-                ts = time.time()
-
-            # Find the matching tool result (child message with parentId == this message's id)
-            results = []
-            for obj2 in lines:
-                if obj2.get("parentId") != call_msg_id:
+            for block in content:
+                if not isinstance(block, dict):
                     continue
-                msg2 = obj2.get("message", {})
-                if msg2.get("role") != "toolResult":
+                if block.get("type") != "toolCall" or block.get("name") != "memory_search":
                     continue
+                query = block.get("arguments", {}).get("query", "")
+                if query:
+                    calls.append((obj.get("id", ""), obj.get("timestamp", ""), query))
+    except (fastjson.JSONDecodeError, IOError) as e:
+        return 0
 
-                content2 = msg2.get("content", [])
-                if isinstance(content2, list):
-                    for b2 in content2:
-                        if isinstance(b2, dict) and b2.get("type") == "text":
-                            text = b2.get("text", "")
-                            try:
-                                parsed = json.loads(text)
-                                if isinstance(parsed, dict) and "results" in parsed:
-                                    for r in parsed["results"]:
-                                        # Map to access_logger format
-                                        # path could be a session transcript or a memory file
-                                        file_path = r.get("path", "")
-                                        # Only count memory file results, not session transcript hits
-                                        if file_path.startswith("sessions/"):
-                                            continue
-                                        results.append({
-                                            "file": file_path,
-                                            "lines": str(r.get("startLine", "")),
-                                            "score": r.get("score", 0),
-                                        })
-                            except (json.JSONDecodeError, TypeError):
-                                pass
-                break  # Found the result
-
-            # Log the event
-            log_event(query, results, session_id=session_id, timestamp=ts)
-            count += 1
-
-    return count
+    events = []
+    for call_msg_id, timestamp_str, query in calls:
+        # Parse timestamp
+        ts = None
+        if timestamp_str:
+            try:
+                dt = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
+                ts = dt.timestamp()
+            except (ValueError, TypeError):
+                pass
+        if ts is None:
+            ts = time.time()
+
+        # Find the matching tool result (child message with parentId == this message's id)
+        results = []
+        msg2 = result_by_parent.get(call_msg_id)
+        content2 = msg2.get("content", []) if msg2 else []
+        if isinstance(content2, list):
+            for b2 in content2:
+                if isinstance(b2, dict) and b2.get("type") == "text":
+                    text = b2.get("text", "")
+                    try:
+                        parsed = fastjson.loads(text)
+                        if isinstance(parsed, dict) and "results" in parsed:
+                            for r in parsed["results"]:
+                                # Map to access_logger format
+                                # path could be a session transcript or a memory file
+                                file_path = r.get("path", "")
+                                # Only count memory file results, not session transcript hits
+                                if file_path.startswith("sessions/"):
+                                    continue
+                                # (file, lines, score) — the logger's native shape
+                                results.append((file_path, str(r.get("startLine", "")), r.get("score", 0)))
+                    except (fastjson.JSONDecodeError, TypeError):
+                        pass
+
+        events.append((query, results, ts))
+
+    return log_events_bulk(events, session_id=session_id, db=db)
 
 
 def main():
@@ -174,22 +173,39 @@ def main():
         sys.exit(1)
 
     session_files = sorted(SESSIONS_DIR.glob("*.jsonl"))
-    processed = get_processed_sessions() if not reprocess else set()
 
-    total_events = 0
-    new_sessions = 0
+    # One connection and one transaction for the whole scan: a backfill pays a
+    # single commit instead of one per session (plus one per processed mark)
+    db = get_db()
+    init_state(db)
+    try:
+        processed = get_processed_sessions(db) if not reprocess else set()
+
+        total_events = 0
+        new_sessions = 0
+        marks = []
+
+        db.execute("BEGIN IMMEDIATE")
+        for sf in session_files:
+            session_id = sf.stem
+            if session_id in processed:
+                continue
+
+            events = extract_session(sf, db)
+            marks.append((session_id, time.time(), events))
 
-    for sf in session_files:
-        session_id = sf.stem
-        if session_id in processed:
-            continue
+            if events > 0:
+                new_sessions += 1
+                total_events += events
 
-        events = extract_session(sf)
-        mark_processed(session_id, events)
+        mark_processed(db, marks)
 
-        if events > 0:
-            new_sessions += 1
-            total_events += events
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
     print(json.dumps({
         "sessions_scanned": len(session_files),
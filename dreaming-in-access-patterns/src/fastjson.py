@@ -0,0 +1,25 @@
+"""
+JSON shim — orjson when installed, stdlib json otherwise.
+
+Session transcripts and the access log are parsed line-by-line and row-by-row;
+orjson is several times faster on both loads and dumps. Both backends accept
+bytes as well as str, and orjson.JSONDecodeError subclasses
+json.JSONDecodeError, so callers catch a single exception type.
+"""
+
+import json
+from json import JSONDecodeError
+
+try:
+    import orjson
+
+    loads = orjson.loads
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+except ImportError:
+    loads = json.loads
+    dumps = json.dumps
+
+__all__ = ["loads", "dumps", "JSONDecodeError"]
@@ -15,61 +15,191 @@ Usage:
   python mirror.py generate --dry-run
 """
 
-import json
+import heapq
+import re
 import sqlite3
 import sys
 import time
 import os
+from bisect import bisect_right
 from pathlib import Path
 from datetime import datetime, timezone
 from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import combinations
+from typing import Iterable, Iterator
+
+import fastjson
+from access_logger import _init_schema
+
+# Sparse co-occurrence counting for analyze_resonance; pure-Python fallback otherwise
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
 
 WORKSPACE = Path(os.environ.get("WORKSPACE", "/home/clawd/clawd"))
 ACCESS_DB = Path(__file__).parent / "access.db"
 MIRROR_PATH = WORKSPACE / "memory" / "mirror.md"
 SESSIONS_DIR = Path(os.path.expanduser("~/.openclaw/agents/main/sessions"))
 
+# Match "exited with code N" in tool results
+_EXIT_CODE_RE = re.compile(r'(?:Process |Command )exited with code (\d+)')
+
+# Raw-line prefilter for analyze_tool_failures: a JSONL line can only count as a
+# failure if one of these appears in its bytes (quotes are escaped inside the
+# JSON-encoded text), so every other line skips the JSON parse entirely.
+_FAILURE_HINTS = [
+    rb'exited with code',
+    rb'Command timed out',
+    rb'status\\?"\s*:\s*\\?"error',
+]
+_FAILURE_HINT_RE = re.compile(b"|".join(_FAILURE_HINTS))
+
+# Hyperscan matches all hints in one DFA pass; optional, regex fallback otherwise
+try:
+    import hyperscan
+    _FAILURE_HINT_DB = hyperscan.Database()
+    _FAILURE_HINT_DB.compile(
+        expressions=_FAILURE_HINTS,
+        ids=list(range(len(_FAILURE_HINTS))),
+        elements=len(_FAILURE_HINTS),
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(_FAILURE_HINTS),
+    )
+except ImportError:
+    _FAILURE_HINT_DB = None
+
 # Boot context files — things loaded every session
 BOOT_FILES = {"MEMORY.md", "SOUL.md", "USER.md", "IDENTITY.md", "TOOLS.md", "AGENTS.md", "HEARTBEAT.md"}
 
 
-def load_access_data(days: int = 14) -> dict:
-    """Load access events from the last N days."""
+def load_access_data(days: int = 14) -> Iterator[tuple]:
+    """
+    Stream access events from the last N days, oldest first.
+
+    Yields raw rows (ts, session_id, query, n_results, top_score), fetched in
+    batches. Per-chunk results come from load_access_results, not the JSON column.
+    """
     if not ACCESS_DB.exists():
-        return {"events": [], "chunks": {}}
+        return
 
     db = sqlite3.connect(str(ACCESS_DB))
     cutoff = time.time() - (days * 86400)
+    try:
+        cursor = db.execute(
+            "SELECT timestamp, session_id, query, n_results, top_score "
+            "FROM access_events WHERE timestamp > ? ORDER BY timestamp",
+            (cutoff,)
+        )
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        db.close()
+
+
+def load_access_results(days: int = 14) -> Iterator[tuple]:
+    """
+    Stream (session_id, chunk_key) for every chunk retrieved in the last N days.
+
+    Reads the access_results side table the logger writes per result, so no
+    JSON is decoded. An access.db that predates the table is migrated first.
+    """
+    if not ACCESS_DB.exists():
+        return
 
-    events = db.execute(
-        "SELECT timestamp, session_id, query, results, n_results, top_score "
-        "FROM access_events WHERE timestamp > ? ORDER BY timestamp",
-        (cutoff,)
-    ).fetchall()
+    db = sqlite3.connect(str(ACCESS_DB))
+    cutoff = time.time() - (days * 86400)
+    try:
+        if not db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'access_results'"
+        ).fetchone():
+            # No logger call has run since the upgrade: run its migration
+            # (creates and backfills access_results) instead of reporting nothing
+            _init_schema(db)
+        cursor = db.execute(
+            "SELECT session_id, chunk_key FROM access_results WHERE ts > ? ORDER BY ts",
+            (cutoff,)
+        )
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        db.close()
+
+
+def load_chunk_energy() -> dict:
+    """Load the cumulative chunk energy map."""
+    if not ACCESS_DB.exists():
+        return {}
 
+    db = sqlite3.connect(str(ACCESS_DB))
     chunks = db.execute(
         "SELECT chunk_key, total_accesses, total_score, last_accessed, first_accessed "
         "FROM chunk_energy ORDER BY total_accesses DESC"
     ).fetchall()
+    db.close()
+
+    return {
+        c[0]: {"accesses": c[1], "score": c[2], "last": c[3], "first": c[4]}
+        for c in chunks
+    }
+
+
+def load_event_stats(days: int = 14) -> dict:
+    """Event, unique-query and session counts for the last N days, counted in SQL."""
+    if not ACCESS_DB.exists():
+        return {"n_events": 0, "unique_queries": 0, "sessions_with_search": 0}
 
+    db = sqlite3.connect(str(ACCESS_DB))
+    cutoff = time.time() - (days * 86400)
+    n_events, unique_queries, sessions = db.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT query), COUNT(DISTINCT NULLIF(session_id, '')) "
+        "FROM access_events WHERE timestamp > ?",
+        (cutoff,)
+    ).fetchone()
     db.close()
 
+    return {"n_events": n_events, "unique_queries": unique_queries, "sessions_with_search": sessions}
+
+
+def scan_events(events: Iterable[tuple], results: Iterable[tuple]) -> dict:
+    """
+    Single pass over each stream, feeding the friction, resonance and promotion
+    accumulators (gaps and stats are aggregated in SQL).
+
+    events: rows from load_access_data; results: rows from load_access_results.
+    """
+    session_queries = defaultdict(dict)  # friction: session → {first-3-words: count}
+    session_chunks = defaultdict(set)    # resonance: session → chunks retrieved
+    chunk_sessions = defaultdict(set)    # promotion: chunk → sessions retrieving it
+
+    for ts, session, query, n_results, top_score in events:
+        sid = session or "unknown"
+        # Fuzzy query identity: same first 3 words
+        key = " ".join(query.lower().split()[:3])
+        seen = session_queries[sid]
+        seen[key] = seen.get(key, 0) + 1
+
+    for session, chunk_key in results:
+        sid = session or "unknown"
+        session_chunks[sid].add(chunk_key)
+        chunk_sessions[chunk_key].add(sid)
+
     return {
-        "events": [
-            {"ts": e[0], "session": e[1], "query": e[2],
-             "results": json.loads(e[3]) if e[3] else [], "n_results": e[4], "top_score": e[5]}
-            for e in events
-        ],
-        "chunks": {
-            c[0]: {"accesses": c[1], "score": c[2], "last": c[3], "first": c[4]}
-            for c in chunks
-        }
+        "session_queries": session_queries,
+        "session_chunks": session_chunks,
+        "chunk_sessions": chunk_sessions,
     }
 
 
-def analyze_hot_cold(data: dict, top_n: int = 10) -> dict:
+def analyze_hot_cold(chunks: dict, top_n: int = 10) -> dict:
     """Identify hottest and coldest chunks."""
-    chunks = data["chunks"]
     if not chunks:
         return {"hot": [], "cold": []}
 
@@ -84,91 +214,153 @@ def analyze_hot_cold(data: dict, top_n: int = 10) -> dict:
     }
 
 
-def analyze_gaps(data: dict) -> list:
+def analyze_gaps(days: int = 14) -> list:
     """Find queries that returned 0 results or low scores — gaps in memory."""
-    gaps = []
-    query_counts = Counter()
-
-    for event in data["events"]:
-        if event["n_results"] == 0 or event["top_score"] == 0:
-            query_counts[event["query"]] += 1
+    if not ACCESS_DB.exists():
+        return []
 
-    # Queries that repeatedly fail
-    for query, count in query_counts.most_common(15):
-        gaps.append({"query": query, "misses": count})
+    db = sqlite3.connect(str(ACCESS_DB))
+    cutoff = time.time() - (days * 86400)
+    # Queries that repeatedly fail; ties go to the query that failed first
+    rows = db.execute(
+        "SELECT query, COUNT(*) FROM access_events "
+        "WHERE timestamp > ? AND (n_results = 0 OR top_score = 0) "
+        "GROUP BY query ORDER BY COUNT(*) DESC, MIN(timestamp) LIMIT 15",
+        (cutoff,)
+    ).fetchall()
+    db.close()
 
-    return gaps
+    return [{"query": query, "misses": count} for query, count in rows]
 
 
-def analyze_friction(data: dict) -> list:
+def analyze_friction(scan: dict) -> list:
     """Find repeated searches in the same session — retrieval friction."""
-    session_queries = defaultdict(list)
-
-    for event in data["events"]:
-        sid = event["session"] or "unknown"
-        session_queries[sid].append(event["query"])
-
-    friction = []
-    for sid, queries in session_queries.items():
-        # Look for similar queries in same session (fuzzy: same first 3 words)
-        seen = defaultdict(int)
-        for q in queries:
-            key = " ".join(q.lower().split()[:3])
-            seen[key] += 1
+    # Repeats within a session, summed across sessions
+    pattern_counts = Counter()
+    for sid, seen in scan["session_queries"].items():
         for key, count in seen.items():
             if count >= 2:
-                friction.append({"pattern": key, "repeats": count, "session": sid[:8]})
-
-    # Deduplicate across sessions
-    pattern_counts = Counter()
-    for f in friction:
-        pattern_counts[f["pattern"]] += f["repeats"]
+                pattern_counts[key] += count
 
     return [{"pattern": p, "total_repeats": c} for p, c in pattern_counts.most_common(10)]
 
 
-def analyze_resonance(data: dict) -> list:
+def _cooccur_python(session_chunks: dict) -> list:
+    # Intern keys as ints in key order: pairs hash as int tuples, and sorted ids
+    # give (a, b) with a < b just like sorted keys would
+    keys = sorted(set().union(*session_chunks.values()))
+    chunk_id = {k: i for i, k in enumerate(keys)}
+
+    cooccur = Counter()
+    for chunks in session_chunks.values():
+        cooccur.update(combinations(sorted(chunk_id[k] for k in chunks), 2))
+    return [((keys[a], keys[b]), count) for (a, b), count in cooccur.items() if count >= 2]
+
+
+def _cooccur_sparse(session_chunks: dict) -> list:
+    # Binary session × chunk incidence matrix X; (X.T @ X)[a, b] = sessions where
+    # a and b both appear. Upper triangle only — each unordered pair once.
+    chunk_id = {}
+    rows, cols = [], []
+    for si, chunks in enumerate(session_chunks.values()):
+        for key in chunks:
+            rows.append(si)
+            cols.append(chunk_id.setdefault(key, len(chunk_id)))
+    if not cols:
+        return []
+
+    X = sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.int32), (rows, cols)),
+        shape=(len(session_chunks), len(chunk_id)),
+    )
+    M = sparse.triu(X.T @ X, k=1).tocoo()
+    keep = M.data >= 2
+    a_ids, b_ids, counts = M.row[keep], M.col[keep], M.data[keep]
+
+    # Only the top 20 get reported; drop everything below the 20th-largest count
+    if len(counts) > 20:
+        floor = np.partition(counts, -20)[-20]
+        top = counts >= floor
+        a_ids, b_ids, counts = a_ids[top], b_ids[top], counts[top]
+
+    keys = list(chunk_id)
+    resonant = []
+    for a, b, count in zip(a_ids.tolist(), b_ids.tolist(), counts.tolist()):
+        pair = tuple(sorted((keys[a], keys[b])))
+        resonant.append((pair, count))
+    return resonant
+
+
+def analyze_resonance(scan: dict) -> list:
     """Find chunks that co-access across sessions."""
-    session_chunks = defaultdict(set)
+    session_chunks = scan["session_chunks"]
 
-    for event in data["events"]:
-        sid = event["session"] or "unknown"
-        for r in event["results"]:
-            key = f"{r.get('file', '?')}:{r.get('lines', '?')}"
-            session_chunks[sid].add(key)
+    # Pairs that co-occur in 2+ sessions
+    if sparse is not None:
+        resonant = _cooccur_sparse(session_chunks)
+    else:
+        resonant = _cooccur_python(session_chunks)
 
-    # Count co-occurrences
-    cooccur = Counter()
-    for sid, chunks in session_chunks.items():
-        chunk_list = sorted(chunks)
-        for i in range(len(chunk_list)):
-            for j in range(i + 1, len(chunk_list)):
-                pair = (chunk_list[i], chunk_list[j])
-                cooccur[pair] += 1
+    # Top 20, most sessions first; ties broken by key so both paths agree.
+    # Heap selection — no full sort of every resonant pair.
+    top = heapq.nsmallest(20, resonant, key=lambda x: (-x[1], x[0]))
+
+    return [{"a": p[0], "b": p[1], "sessions": c} for p, c in top]
 
-    # Only pairs that co-occur in 2+ sessions
-    resonant = [(pair, count) for pair, count in cooccur.most_common(20) if count >= 2]
 
-    return [{"a": p[0], "b": p[1], "sessions": c} for p, c in resonant]
+def analyze_promotions(scan: dict, chunks: dict) -> list:
+    """Find chunks worth promoting — high access, broad sessions, not in boot context."""
+    promotions = []
+    # One iteration per unique chunk, not per event
+    for chunk_key, sessions in scan["chunk_sessions"].items():
+        file_part, _, _ = chunk_key.partition(":")
+        if file_part in BOOT_FILES:
+            continue  # already in boot context
+        accesses = chunks.get(chunk_key, {}).get("accesses", 0)
+        if accesses >= 5 and len(sessions) >= 3:
+            promotions.append({
+                "key": chunk_key,
+                "accesses": accesses,
+                "sessions": len(sessions),
+            })
+
+    promotions.sort(key=lambda x: x["accesses"], reverse=True)
+    return promotions
+
+
+def _has_failure_hint(line: bytes) -> bool:
+    if _FAILURE_HINT_DB is None:
+        return _FAILURE_HINT_RE.search(line) is not None
+    hits = []
+    _FAILURE_HINT_DB.scan(line, match_event_handler=lambda *_: hits.append(True))
+    return bool(hits)
 
 
 def analyze_tool_failures(days: int = 14) -> list:
     """Scan recent session transcripts for tool call failures."""
-    import re
     failures = Counter()
     cutoff = time.time() - (days * 86400)
 
     if not SESSIONS_DIR.exists():
         return []
 
-    for sf in sorted(SESSIONS_DIR.glob("*.jsonl"), key=lambda f: f.stat().st_mtime, reverse=True):
-        if sf.stat().st_mtime < cutoff:
-            break
+    # One stat per file, newest first (negated mtimes sort ascending for bisect);
+    # everything past the cutoff index is never opened
+    entries = sorted(
+        (-e.stat().st_mtime, e.path)
+        for e in os.scandir(SESSIONS_DIR)
+        if e.name.endswith(".jsonl")
+    )
+    recent = bisect_right([neg_mtime for neg_mtime, _ in entries], -cutoff)
+
+    for _, sf in entries[:recent]:
         try:
-            with open(sf) as f:
+            with open(sf, "rb") as f:
                 for line in f:
+                    if not _has_failure_hint(line):
+                        continue
                     try:
-                        obj = json.loads(line)
+                        obj = fastjson.loads(line)
                         msg = obj.get("message", {})
                         # Look for toolResult messages with error indicators
                         if msg.get("role") != "toolResult":
@@ -180,15 +372,16 @@ def analyze_tool_failures(days: int = 14) -> list:
                             if not isinstance(b, dict) or b.get("type") != "text":
                                 continue
                             text = b.get("text", "")
-                            # Match "exited with code N" where N != 0
-                            m = re.search(r'(?:Process |Command )exited with code (\d+)', text)
+                            # Match "exited with code N" where N != 0.
+                            # Substring test first — most results never exited at all.
+                            m = _EXIT_CODE_RE.search(text) if "exited with code" in text else None
                             if m and m.group(1) != "0":
                                 failures[f"exit:{m.group(1)}"] += 1
                             elif "Command timed out" in text:
                                 failures["timeout"] += 1
                             elif '"status": "error"' in text[:100]:
                                 failures["tool-error"] += 1
-                    except (json.JSONDecodeError, KeyError):
+                    except (fastjson.JSONDecodeError, KeyError):
                         pass
         except IOError:
             continue
@@ -196,17 +389,40 @@ def analyze_tool_failures(days: int = 14) -> list:
     return [{"type": t, "count": c} for t, c in failures.most_common(5) if c >= 2]
 
 
+# The same chunk keys recur across sections and runs of the render loop; cache
+# the string surgery rather than redo it per mention.
+@lru_cache(maxsize=4096)
+def _shorten(key: str) -> str:
+    """Tight form for the hot list: MEMORY.md:51 → M:51, memory/2026-02-07.md:1 → m/0207:1."""
+    if key.startswith("MEMORY.md:"):
+        return f"M:{key.split(':')[1]}"
+    if key.startswith("memory/"):
+        parts = key.replace("memory/", "").split(":")
+        date_part = parts[0].replace("2026-", "").replace("-", "").replace(".md", "")
+        return f"m/{date_part}:{parts[1]}" if len(parts) > 1 else f"m/{date_part}"
+    return key.replace(".md", "").replace(":", "→")[:15]
+
+
+@lru_cache(maxsize=4096)
+def _abbrev(key: str) -> str:
+    """Readable form for resonance pairs: MEMORY.md → M, memory/ → m/, drop .md."""
+    return key.replace("MEMORY.md", "M").replace("memory/", "m/").replace(".md", "")
+
+
 def generate_mirror(dry_run: bool = False) -> str:
     """Generate the mirror file content."""
-    data = load_access_data(days=14)
+    stats = load_event_stats(days=14)
 
-    if not data["events"]:
+    if not stats["n_events"]:
         return "# mirror — no access data yet\n"
 
-    hot_cold = analyze_hot_cold(data)
-    gaps = analyze_gaps(data)
-    friction = analyze_friction(data)
-    resonance = analyze_resonance(data)
+    scan = scan_events(load_access_data(days=14), load_access_results(days=14))
+    chunks = load_chunk_energy()
+    hot_cold = analyze_hot_cold(chunks)
+    gaps = analyze_gaps(days=14)
+    friction = analyze_friction(scan)
+    resonance = analyze_resonance(scan)
+    promotions = analyze_promotions(scan, chunks)
     tool_fails = analyze_tool_failures(days=14)
 
     now = datetime.now(timezone.utc)
@@ -216,19 +432,7 @@ def generate_mirror(dry_run: bool = False) -> str:
     if hot_cold["hot"]:
         hot_strs = []
         for h in hot_cold["hot"][:8]:
-            key = h["key"]
-            # Compress: MEMORY.md:51 → M:51, memory/2026-02-07.md:1 → m/0207:1
-            if key.startswith("MEMORY.md:"):
-                short = f"M:{key.split(':')[1]}"
-            elif key.startswith("memory/"):
-                parts = key.replace("memory/", "").split(":")
-                date_part = parts[0].replace("2026-", "").replace("-", "").replace(".md", "")
-                short = f"m/{date_part}:{parts[1]}" if len(parts) > 1 else f"m/{date_part}"
-            else:
-                short = key.replace(".md", "").replace(":", "→")
-                if len(short) > 15:
-                    short = short[:15]
-            hot_strs.append(f"{short}({h['accesses']}x)")
+            hot_strs.append(f"{_shorten(h['key'])}({h['accesses']}x)")
         lines.append(f"hot: {' '.join(hot_strs)}")
 
     # Gaps — queries that fail
@@ -245,8 +449,7 @@ def generate_mirror(dry_run: bool = False) -> str:
     if resonance:
         lines.append("resonance:")
         for r in resonance[:5]:
-            a = r["a"].replace("MEMORY.md", "M").replace("memory/", "m/").replace(".md", "")
-            b = r["b"].replace("MEMORY.md", "M").replace("memory/", "m/").replace(".md", "")
+            a, b = _abbrev(r["a"]), _abbrev(r["b"])
             lines.append(f"  {a} ↔ {b} ({r['sessions']}s)")
 
     # Tool failures
@@ -255,38 +458,13 @@ def generate_mirror(dry_run: bool = False) -> str:
         lines.append(f"errors: {' '.join(fail_strs)}")
 
     # Promotion candidates — high access, broad sessions, not in boot context
-    boot_files = {"MEMORY.md", "SOUL.md", "USER.md", "IDENTITY.md", "TOOLS.md", "AGENTS.md", "HEARTBEAT.md"}
-    session_chunks = defaultdict(set)
-    for event in data["events"]:
-        sid = event["session"] or "unknown"
-        for r in event["results"]:
-            key = f"{r.get('file', '?')}:{r.get('lines', '?')}"
-            session_chunks[key].add(sid)
-
-    promotions = []
-    for chunk_key, sessions in session_chunks.items():
-        file_part = chunk_key.split(":")[0]
-        if file_part in boot_files:
-            continue  # already in boot context
-        accesses = data["chunks"].get(chunk_key, {}).get("accesses", 0)
-        if accesses >= 5 and len(sessions) >= 3:
-            promotions.append({
-                "key": chunk_key,
-                "accesses": accesses,
-                "sessions": len(sessions),
-            })
-
     if promotions:
-        promotions.sort(key=lambda x: x["accesses"], reverse=True)
         promo_strs = [f"{p['key']}({p['accesses']}x/{p['sessions']}s)" for p in promotions[:5]]
         lines.append(f"promote: {' | '.join(promo_strs)}")
 
     # Stats
-    total_events = len(data["events"])
-    unique_queries = len(set(e["query"] for e in data["events"]))
-    sessions_with_search = len(set(e["session"] for e in data["events"] if e["session"]))
     lines.append("")
-    lines.append(f"stats: {total_events}ev/{unique_queries}uq/{sessions_with_search}sess/14d")
+    lines.append(f"stats: {stats['n_events']}ev/{stats['unique_queries']}uq/{stats['sessions_with_search']}sess/14d")
 
     content = "\n".join(lines) + "\n"
 
@@ -17,37 +17,106 @@ Run from heartbeat/cron. Idempotent — safe to run repeatedly.
 Usage:
   python pipeline.py run                    # Full reconsolidation pass
   python pipeline.py run --dry-run          # Show what would change, don't write
+  python pipeline.py run --skip-baseline    # Promoted DCT only (half the transform work)
+  python pipeline.py run --bulk             # Rewrite embeddings by drop + recreate of the vec table
   python pipeline.py metrics                # Show reconsolidation history
   python pipeline.py energy                 # Show current access energy map
 """
 
+import atexit
 import json
 import sqlite3
-import struct
 import sys
 import time
 import numpy as np
+from functools import lru_cache
 from pathlib import Path
 from scipy.fft import dct, idct
 from typing import Optional
 
+# Only vmem access (run) needs sqlite-vec; energy/metrics work without it
+try:
+    import sqlite_vec
+except ImportError:
+    sqlite_vec = None
+
 # Paths
 TOOLS_DIR = Path(__file__).parent.parent
 ACCESS_DB = Path(__file__).parent / "access.db"
 VMEM_DB = TOOLS_DIR / "vectordb" / "memory.db"
 METRICS_DB = Path(__file__).parent / "metrics.db"
+DCT_CACHE_DIR = Path(__file__).parent  # dct_basis_<N>.npy lives here between runs
 EMBEDDING_DIM = 384  # BGE-small-en-v1.5
+# Below these, reconsolidate skips as low-signal: fewer accessed chunks than
+# max(MIN_ENERGY_CHUNKS, MIN_ENERGY_FRACTION * N), or peak energy < MIN_ENERGY
+MIN_ENERGY_CHUNKS = 10
+MIN_ENERGY_FRACTION = 0.001
+MIN_ENERGY = 0.01
+DCT_MATMUL_MAX_N = 2048  # up to this N, a cached basis + GEMM beats scipy.fft's DCT
 
 
-def serialize_f32(vector: list[float]) -> bytes:
+def serialize_f32(vector) -> bytes:
     """Serialize float32 vector for sqlite-vec."""
-    return struct.pack(f"{len(vector)}f", *vector)
+    return np.asarray(vector, dtype=np.float32).tobytes()
 
 
 def deserialize_f32(blob: bytes) -> np.ndarray:
-    """Deserialize float32 vector from sqlite-vec."""
-    n = len(blob) // 4
-    return np.array(struct.unpack(f"{n}f", blob), dtype=np.float32)
+    """Deserialize float32 vector from sqlite-vec (read-only view of the blob — copy before mutating)."""
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def unit_rows(X: np.ndarray) -> np.ndarray:
+    """X with every row scaled to unit L2 norm (zero rows stay zero)."""
+    return X / np.sqrt(np.einsum("ij,ij->i", X, X) + 1e-20)[:, np.newaxis]
+
+
+def row_cos(An: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity of each row of An with the same row of B.
+
+    An must already be unit_rows(); with one side pre-normalized the cosine is
+    a dot product over B's norm — two reductions instead of three, and no
+    normalized copy of B.
+    """
+    return np.einsum("ij,ij->i", An, B) / np.sqrt(np.einsum("ij,ij->i", B, B) + 1e-20)
+
+
+@lru_cache(maxsize=2)
+def _dct_basis(n: int) -> np.ndarray:
+    """
+    Orthonormal DCT-II matrix B (n×n): dct(X, axis=0, norm='ortho') == B @ X, and B.T inverts it.
+
+    Persisted as dct_basis_<n>.npy and memory-mapped on later runs — vmem's N
+    rarely changes between cron passes. Bases for other sizes are deleted when
+    a new one is written.
+    """
+    cache_path = DCT_CACHE_DIR / f"dct_basis_{n}.npy"
+    if cache_path.exists():
+        try:
+            B = np.load(cache_path, mmap_mode='r')
+            if B.shape == (n, n) and B.dtype == np.float32:
+                return B
+        except (OSError, ValueError):
+            pass  # truncated/corrupt cache — rebuild below
+
+    B = dct(np.eye(n, dtype=np.float32), axis=0, norm='ortho')
+    try:
+        for stale in DCT_CACHE_DIR.glob("dct_basis_*.npy"):
+            if stale != cache_path:
+                stale.unlink()
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, B)
+        tmp_path.replace(cache_path)
+    except OSError:
+        pass  # read-only install: just recompute next run
+    return B
+
+
+def _unweight_row_cos(En: np.ndarray, R: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """R /= weight[:, None] in place and return row_cos(En, R)."""
+    R /= weight[:, np.newaxis]
+    return row_cos(En, R)
 
 
 def init_metrics_db():
@@ -67,9 +136,14 @@ def init_metrics_db():
             max_promoted_delta REAL,
             max_demoted_delta REAL,
             total_access_events INTEGER,
-            details TEXT  -- JSON with per-chunk deltas
+            details TEXT,  -- JSON with per-chunk deltas
+            baseline TEXT DEFAULT 'dct'  -- 'skipped': before/delta columns are NULL
         )
     """)
+    # Pre-baseline metrics DBs: add the column (old rows all ran the baseline)
+    columns = {r[1] for r in db.execute("PRAGMA table_info(reconsolidation_runs)")}
+    if "baseline" not in columns:
+        db.execute("ALTER TABLE reconsolidation_runs ADD COLUMN baseline TEXT DEFAULT 'dct'")
     db.execute("""
         CREATE TABLE IF NOT EXISTS retrieval_tracking (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -98,82 +172,117 @@ def load_access_energy(half_life_hours: float = 168.0) -> dict:
     now = time.time()
     decay_rate = np.log(2) / (half_life_hours * 3600)
 
+    # Never-stamped rows count as accessed now (age 0)
     rows = db.execute(
-        "SELECT chunk_key, total_accesses, total_score, last_accessed, first_accessed "
-        "FROM chunk_energy WHERE total_accesses > 0"
+        "SELECT chunk_key, total_score, COALESCE(last_accessed, ?) "
+        "FROM chunk_energy WHERE total_accesses > 0",
+        (now,)
     ).fetchall()
     db.close()
 
-    energy = {}
-    for chunk_key, accesses, total_score, last_accessed, first_accessed in rows:
-        age = now - (last_accessed or now)
-        decay = np.exp(-decay_rate * age)
-        # Energy combines frequency (accesses), strength (score), and recency (decay)
-        e = (total_score / max(accesses, 1)) * accesses * decay
-        energy[chunk_key] = float(e)
+    if not rows:
+        return {}
+
+    # Column arrays → one vectorized decay instead of an np.exp call per row
+    n = len(rows)
+    total_score = np.fromiter((r[1] for r in rows), dtype=np.float64, count=n)
+    last_accessed = np.fromiter((r[2] for r in rows), dtype=np.float64, count=n)
+    decay = np.exp(-decay_rate * (now - last_accessed))
+    # Energy combines frequency (accesses), strength (score), and recency (decay).
+    # mean score × accesses = (total_score / accesses) * accesses = total_score,
+    # exact here since the WHERE clause guarantees accesses >= 1.
+    e = total_score * decay
 
     # Normalize to [0, 1]
-    if energy:
-        max_e = max(energy.values())
-        if max_e > 0:
-            energy = {k: v / max_e for k, v in energy.items()}
+    max_e = e.max()
+    if max_e > 0:
+        e /= max_e
 
+    energy = dict(zip((r[0] for r in rows), e.tolist()))
     return energy
 
 
-def load_vmem_chunks() -> tuple[list[dict], np.ndarray]:
-    """Load chunks and their embeddings from vmem."""
-    if not VMEM_DB.exists():
-        return [], np.array([])
+@lru_cache(maxsize=1)
+def _get_vmem_conn() -> sqlite3.Connection:
+    """
+    Open vmem once per process, with sqlite-vec loaded and PRAGMAs set.
 
+    Shared by load_vmem_chunks and _write_embeddings so a run pays one connect
+    and one extension load; closed at interpreter exit.
+    """
+    if sqlite_vec is None:
+        raise RuntimeError("sqlite-vec is not installed (pip install sqlite-vec); it's needed to read vmem")
     db = sqlite3.connect(str(VMEM_DB))
-    db.enable_load_extension(True)
-    import sqlite_vec
-    sqlite_vec.load(db)
-    db.enable_load_extension(False)
-    
-    # Get chunks
-    chunks = db.execute(
-        "SELECT id, file_path, content, line_start, line_end "
-        "FROM chunks ORDER BY id"
-    ).fetchall()
-
-    if not chunks:
+    if not hasattr(db, "enable_load_extension"):
         db.close()
-        return [], np.array([])
+        raise RuntimeError(
+            "this Python's sqlite3 was built without extension loading; "
+            "sqlite-vec can't be loaded"
+        )
+    db.enable_load_extension(True)
+    try:
+        sqlite_vec.load(db)
+    finally:
+        db.enable_load_extension(False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA cache_size=-65536")
+    atexit.register(db.close)
+    return db
 
-    # Get embeddings (from chunk_embeddings virtual table)
-    # sqlite-vec stores embeddings — we need to read them
-    chunk_data = []
-    embeddings = []
 
-    for chunk_id, file_path, content, line_start, line_end in chunks:
-        # Read embedding from the virtual table
-        row = db.execute(
-            "SELECT embedding FROM chunk_embeddings WHERE chunk_id = ?",
-            (chunk_id,)
-        ).fetchone()
+def load_vmem_chunks() -> tuple[list[dict], np.ndarray]:
+    """Load chunks and their embeddings from vmem."""
+    if not VMEM_DB.exists():
+        return [], np.array([])
 
-        if row:
-            emb = deserialize_f32(row[0])
+    db = _get_vmem_conn()
+
+    # Get chunks with their embeddings (from chunk_embeddings virtual table) in
+    # one streamed join, not a vtable lookup per chunk. Chunks without an
+    # embedding drop out of the inner join.
+    join = "FROM chunks c JOIN chunk_embeddings e ON e.chunk_id = c.id"
+
+    # COUNT and the streamed SELECT share one read transaction, so under WAL
+    # both see the same snapshot even if vmem is reindexed in between.
+    db.execute("BEGIN")
+    try:
+        N = db.execute(f"SELECT COUNT(*) {join}").fetchone()[0]
+        if N == 0:
+            return [], np.array([])
+
+        embeddings = None
+        chunk_data = []
+        cursor = db.execute(
+            "SELECT c.id, c.file_path, substr(c.content, 1, 80) AS preview, c.line_start, c.line_end, "
+            f"c.file_path || ':' || c.line_start AS chunk_key, e.embedding {join} "
+            "ORDER BY c.id"
+        )
+        for i, (chunk_id, file_path, preview, line_start, line_end, chunk_key, blob) in enumerate(cursor):
+            if embeddings is None:
+                embeddings = np.empty((N, len(blob) // 4), dtype=np.float32)
+            embeddings[i] = deserialize_f32(blob)
             chunk_data.append({
                 "id": chunk_id,
                 "file_path": file_path,
-                "content": content,
+                "preview": preview,
                 "line_start": line_start,
                 "line_end": line_end,
-                "chunk_key": f"{file_path}:{line_start}",
+                "chunk_key": chunk_key,
             })
-            embeddings.append(emb)
+    finally:
+        db.commit()
 
-    db.close()
-    return chunk_data, np.array(embeddings) if embeddings else np.array([])
+    return chunk_data, embeddings
 
 
 def reconsolidate(
     keep_ratio: float = 0.15,
     promotion_strength: float = 1.5,
-    dry_run: bool = False
+    dry_run: bool = False,
+    skip_baseline: bool = False,
+    bulk: bool = False
 ) -> dict:
     """
     Run the reconsolidation pipeline.
@@ -183,7 +292,23 @@ def reconsolidate(
     3. DCT → truncate → IDCT (accessed memories survive compression)
     4. Write back to vmem (unless dry_run)
     5. Log metrics
+
+    skip_baseline drops the unweighted DCT pass (half the transform work).
+    With nothing to compare against, avg_sim_before/avg_delta are None and
+    promoted/demoted are replaced by worst_reconstructed (lowest sim_after).
+
+    bulk rewrites chunk_embeddings by drop + recreate instead of per-row
+    delete/insert (see _write_embeddings).
     """
+    if VMEM_DB.exists() and not _get_vmem_conn().execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'chunk_embeddings'"
+    ).fetchone():
+        return {
+            "error": "chunk_embeddings table missing from vmem",
+            "action": "none",
+            "hint": "Reindex vmem to rebuild its embeddings table"
+        }
+
     chunks, E = load_vmem_chunks()
     if len(chunks) == 0:
         return {"error": "no chunks in vmem", "action": "none"}
@@ -200,13 +325,11 @@ def reconsolidate(
         }
 
     # Build energy vector aligned to chunk order
-    energy = np.zeros(N)
-    n_with_energy = 0
-    for i, chunk in enumerate(chunks):
-        e = energy_map.get(chunk["chunk_key"], 0.0)
-        energy[i] = e
-        if e > 0:
-            n_with_energy += 1
+    energy = np.fromiter(
+        (energy_map.get(c["chunk_key"], 0.0) for c in chunks),
+        dtype=np.float64, count=N
+    )
+    n_with_energy = int((energy > 0).sum())
 
     if n_with_energy == 0:
         return {
@@ -216,38 +339,50 @@ def reconsolidate(
             "hint": "Access events exist but none match current vmem chunks (chunk keys may have shifted after reindex)"
         }
 
-    # --- Standard DCT (baseline) ---
+    # Too few / too faint accessed chunks: the promoted reconstruction would be
+    # indistinguishable from the baseline, so skip the transforms entirely
+    max_energy = float(energy.max())
+    if n_with_energy < max(MIN_ENERGY_CHUNKS, MIN_ENERGY_FRACTION * N) or max_energy < MIN_ENERGY:
+        return {
+            "action": "skipped_low_signal",
+            "n_chunks": N,
+            "n_with_energy": n_with_energy,
+            "max_energy": max_energy,
+            "hint": "Not enough access energy on current chunks to reshape anything yet"
+        }
+
     k = max(1, int(N * keep_ratio))
-    C_standard = dct(E, axis=0, norm='ortho')
-    C_trunc = np.zeros_like(C_standard)
-    C_trunc[:k] = C_standard[:k]
-    R_standard = idct(C_trunc, axis=0, norm='ortho')
+
+    # DCT → keep first k coefficients → IDCT. Small N: only the k retained basis
+    # rows matter, so R = Bk.T @ (Bk @ X) — k×D intermediates, no zero-padded
+    # N×D coefficient matrix. Large N: scipy.fft, zeroing the tail of the
+    # coefficient buffer in place. overwrite=True lets it consume X.
+    if N <= DCT_MATMUL_MAX_N:
+        Bk = _dct_basis(N)[:k]
+        def lowpass(X, overwrite=False):
+            return Bk.T @ (Bk @ X)  # never writes X, so overwrite is moot
+    else:
+        def lowpass(X, overwrite=False):
+            C = dct(X, axis=0, norm='ortho', workers=-1, overwrite_x=overwrite)
+            C[k:] = 0
+            return idct(C, axis=0, norm='ortho', workers=-1, overwrite_x=True)
+
+    # --- Standard DCT (baseline) ---
+    if not skip_baseline:
+        R_standard = lowpass(E)
 
     # --- Promoted DCT ---
     weight = 1.0 + promotion_strength * energy
-    E_weighted = E * weight[:, np.newaxis]
+    E_weighted = E * weight[:, np.newaxis]  # the one copy: E itself is still needed
 
-    C_promoted = dct(E_weighted, axis=0, norm='ortho')
-    C_ptrunc = np.zeros_like(C_promoted)
-    C_ptrunc[:k] = C_promoted[:k]
-    R_promoted_raw = idct(C_ptrunc, axis=0, norm='ortho')
-    R_promoted = R_promoted_raw / weight[:, np.newaxis]
+    # Normalize the originals once; each similarity below is then a dot product
+    En = unit_rows(E)
 
-    # Compute similarities (original vs reconstructed)
-    sims_before = np.array([
-        float(np.dot(E[i], R_standard[i]) / (np.linalg.norm(E[i]) * np.linalg.norm(R_standard[i]) + 1e-10))
-        for i in range(N)
-    ])
-    sims_after = np.array([
-        float(np.dot(E[i], R_promoted[i]) / (np.linalg.norm(E[i]) * np.linalg.norm(R_promoted[i]) + 1e-10))
-        for i in range(N)
-    ])
-    delta = sims_after - sims_before
-
-    # Top movers
-    promoted_idx = np.argsort(delta)[-10:][::-1]
-    demoted_idx = np.argsort(delta)[:5]
+    # Un-weight the reconstruction in place and score it against the original
+    R_promoted = lowpass(E_weighted, overwrite=True)
+    sims_after = _unweight_row_cos(En, R_promoted, weight)
 
+    # Compute similarities (original vs reconstructed)
     result = {
         "action": "reconsolidated" if not dry_run else "dry_run",
         "n_chunks": N,
@@ -255,49 +390,81 @@ def reconsolidate(
         "k_coefficients": k,
         "keep_ratio": keep_ratio,
         "promotion_strength": promotion_strength,
-        "avg_sim_before": float(np.mean(sims_before)),
+        "baseline": "skipped" if skip_baseline else "dct",
+        "avg_sim_before": None,
         "avg_sim_after": float(np.mean(sims_after)),
-        "avg_delta": float(np.mean(delta)),
-        "promoted": [
+        "avg_delta": None,
+    }
+    n_top, n_bottom = min(10, N), min(5, N)
+
+    if skip_baseline:
+        # No baseline, so no delta to promote/demote by — report the chunks the
+        # promoted pass reconstructs worst instead
+        worst = np.argpartition(sims_after, n_bottom - 1)[:n_bottom]
+        worst_idx = worst[np.argsort(sims_after[worst])]
+        result["worst_reconstructed"] = [
             {
                 "chunk_key": chunks[int(i)]["chunk_key"],
-                "content": chunks[int(i)]["content"][:80],
+                "content": chunks[int(i)]["preview"],
+                "energy": float(energy[i]),
+                "sim_after": float(sims_after[i]),
+            }
+            for i in worst_idx
+        ]
+    else:
+        sims_before = row_cos(En, R_standard)
+        delta = sims_after - sims_before
+
+        # Top movers — argpartition selects them in O(N), then only those few get sorted
+        top = np.argpartition(delta, N - n_top)[N - n_top:]
+        promoted_idx = top[np.argsort(delta[top])[::-1]]
+        bottom = np.argpartition(delta, n_bottom - 1)[:n_bottom]
+        demoted_idx = bottom[np.argsort(delta[bottom])]
+
+        result["avg_sim_before"] = float(np.mean(sims_before))
+        result["avg_delta"] = float(np.mean(delta))
+        result["promoted"] = [
+            {
+                "chunk_key": chunks[int(i)]["chunk_key"],
+                "content": chunks[int(i)]["preview"],
                 "energy": float(energy[i]),
                 "delta": float(delta[i]),
             }
             for i in promoted_idx if delta[i] > 0.001
-        ],
-        "demoted": [
+        ]
+        result["demoted"] = [
             {
                 "chunk_key": chunks[int(i)]["chunk_key"],
-                "content": chunks[int(i)]["content"][:80],
+                "content": chunks[int(i)]["preview"],
                 "energy": float(energy[i]),
                 "delta": float(delta[i]),
             }
             for i in demoted_idx if delta[i] < -0.001
-        ],
-    }
+        ]
 
     if not dry_run:
         # Write reconsolidated embeddings back to vmem
-        _write_embeddings(chunks, R_promoted)
+        _write_embeddings(chunks, R_promoted, bulk=bulk)
 
-        # Log metrics
+        # Log metrics. Without a baseline there is nothing to compare against,
+        # so the before/delta columns (and per-chunk deltas) are stored as NULL
+        # rather than as numbers that would mix into the history as real runs.
         metrics_db = init_metrics_db()
         metrics_db.execute(
             "INSERT INTO reconsolidation_runs "
             "(timestamp, n_chunks, n_with_energy, k_coefficients, keep_ratio, "
             "promotion_strength, avg_sim_before, avg_sim_after, avg_delta, "
-            "max_promoted_delta, max_demoted_delta, total_access_events, details) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            "max_promoted_delta, max_demoted_delta, total_access_events, details, baseline) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (
                 time.time(), N, n_with_energy, k, keep_ratio,
                 promotion_strength,
-                float(np.mean(sims_before)), float(np.mean(sims_after)),
-                float(np.mean(delta)),
-                float(np.max(delta)), float(np.min(delta)),
+                result["avg_sim_before"], result["avg_sim_after"], result["avg_delta"],
+                None if skip_baseline else float(np.max(delta)),
+                None if skip_baseline else float(np.min(delta)),
                 sum(1 for v in energy_map.values() if v > 0),
-                json.dumps(result["promoted"][:5] + result["demoted"][:3])
+                None if skip_baseline else json.dumps(result["promoted"][:5] + result["demoted"][:3]),
+                result["baseline"]
             )
         )
         metrics_db.commit()
@@ -306,28 +473,43 @@ def reconsolidate(
     return result
 
 
-def _write_embeddings(chunks: list[dict], embeddings: np.ndarray):
-    """Write reconsolidated embeddings back to vmem's sqlite-vec table."""
-    db = sqlite3.connect(str(VMEM_DB))
-    db.enable_load_extension(True)
-    import sqlite_vec
-    sqlite_vec.load(db)
-    db.enable_load_extension(False)
-
-    for i, chunk in enumerate(chunks):
-        emb = embeddings[i].astype(np.float32)
-        # sqlite-vec UPDATE: delete and re-insert the embedding
-        db.execute(
-            "DELETE FROM chunk_embeddings WHERE chunk_id = ?",
-            (chunk["id"],)
-        )
-        db.execute(
+def _write_embeddings(chunks: list[dict], embeddings: np.ndarray, bulk: bool = False):
+    """
+    Write reconsolidated embeddings back to vmem's sqlite-vec table.
+
+    bulk: every embedding is being replaced anyway, so drop the vec0 table and
+    recreate it from its stored schema rather than paying an index delete per
+    row. Embeddings with no row in chunks (never loaded) are not carried over.
+    """
+    db = _get_vmem_conn()
+
+    # One float32 conversion for the whole matrix; serialize_f32 then gets
+    # contiguous float32 rows and its asarray is a no-op
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    rows = [(chunk["id"], serialize_f32(embeddings[i])) for i, chunk in enumerate(chunks)]
+
+    # sqlite-vec UPDATE: delete and re-insert the embedding — all rows, one transaction
+    try:
+        db.execute("BEGIN")
+        if bulk:
+            schema = db.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'chunk_embeddings'"
+            ).fetchone()[0]
+            db.execute("DROP TABLE chunk_embeddings")
+            db.execute(schema)
+        else:
+            db.executemany(
+                "DELETE FROM chunk_embeddings WHERE chunk_id = ?",
+                [(chunk_id,) for chunk_id, _ in rows]
+            )
+        db.executemany(
             "INSERT INTO chunk_embeddings (chunk_id, embedding) VALUES (?, ?)",
-            (chunk["id"], serialize_f32(emb.tolist()))
+            rows
         )
-
-    db.commit()
-    db.close()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
 
 
 def metrics(limit: int = 20) -> list:
@@ -337,7 +519,7 @@ def metrics(limit: int = 20) -> list:
     db = init_metrics_db()
     rows = db.execute(
         "SELECT timestamp, n_chunks, n_with_energy, avg_sim_before, avg_sim_after, "
-        "avg_delta, max_promoted_delta, total_access_events "
+        "avg_delta, max_promoted_delta, total_access_events, baseline "
         "FROM reconsolidation_runs ORDER BY timestamp DESC LIMIT ?",
         (limit,)
     ).fetchall()
@@ -347,11 +529,12 @@ def metrics(limit: int = 20) -> list:
             "timestamp": r[0],
             "chunks": r[1],
             "with_energy": r[2],
-            "sim_before": round(r[3], 4),
+            "sim_before": round(r[3], 4) if r[3] is not None else None,
             "sim_after": round(r[4], 4),
-            "delta": round(r[5], 5),
-            "max_promoted": round(r[6], 5),
+            "delta": round(r[5], 5) if r[5] is not None else None,
+            "max_promoted": round(r[6], 5) if r[6] is not None else None,
             "access_events": r[7],
+            "baseline": r[8],
         }
         for r in rows
     ]
@@ -368,14 +551,16 @@ def energy_map() -> list:
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: pipeline.py <run|metrics|energy> [--dry-run]")
+        print("Usage: pipeline.py <run|metrics|energy> [--dry-run] [--skip-baseline] [--bulk]")
         sys.exit(1)
 
     cmd = sys.argv[1]
     dry_run = "--dry-run" in sys.argv
+    skip_baseline = "--skip-baseline" in sys.argv
+    bulk = "--bulk" in sys.argv
 
     if cmd == "run":
-        result = reconsolidate(dry_run=dry_run)
+        result = reconsolidate(dry_run=dry_run, skip_baseline=skip_baseline, bulk=bulk)
         print(json.dumps(result, indent=2))
 
     elif cmd == "metrics":